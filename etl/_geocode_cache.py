@@ -0,0 +1,57 @@
+"""
+Persistent Nominatim result cache (data/geocode_cache.sqlite), shared by
+geocode_locations.py and scrape_traffic_feeds.py.
+
+Keys are normalized query strings (lowercased, whitespace collapsed, trailing
+", Malaysia" dropped); entries older than TTL_SECONDS are treated as misses so
+they get refreshed.
+"""
+
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+
+DB_PATH = Path(__file__).resolve().parents[1] / "data" / "geocode_cache.sqlite"
+TTL_SECONDS = 30 * 24 * 3600
+
+_RE_WS = re.compile(r"\s+")
+_RE_COUNTRY = re.compile(r",\s*malaysia$")
+
+_lock = threading.Lock()
+_conn = None
+
+
+def _db() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        DB_PATH.parent.mkdir(exist_ok=True)
+        _conn = sqlite3.connect(str(DB_PATH), check_same_thread=False)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("CREATE TABLE IF NOT EXISTS cache(key TEXT PRIMARY KEY, lat REAL, lon REAL, ts INTEGER)")
+        _conn.commit()
+    return _conn
+
+def normalize(name: str) -> str:
+    key = _RE_WS.sub(" ", (name or "").strip().lower())
+    return _RE_COUNTRY.sub("", key)
+
+def get(name: str) -> Optional[Tuple[float, float]]:
+    """(lat, lon) for a fresh cached query, else None."""
+    with _lock:
+        row = _db().execute(
+            "SELECT lat, lon FROM cache WHERE key=? AND ts>?",
+            (normalize(name), int(time.time()) - TTL_SECONDS),
+        ).fetchone()
+    return (row[0], row[1]) if row else None
+
+def put(name: str, lat: float, lon: float):
+    with _lock:
+        conn = _db()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache(key, lat, lon, ts) VALUES (?, ?, ?, ?)",
+            (normalize(name), float(lat), float(lon), int(time.time())),
+        )
+        conn.commit()
@@ -0,0 +1,40 @@
+"""
+HTTP helpers shared by the ETL scripts: a pooled requests.Session that retries
+transient failures, and a one-line log of any X-RateLimit-* headers a server sends.
+"""
+
+from typing import Mapping, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_rate_limit_logged = set()
+
+
+def make_session(headers: Optional[Mapping[str, str]] = None, pool_maxsize: int = 8,
+                 retries: int = 3, backoff_factor: float = 0.3) -> requests.Session:
+    """Session that reuses TCP/TLS connections and retries 429/5xx with backoff."""
+    s = requests.Session()
+    s.headers.update({"Accept-Encoding": "gzip, deflate"})
+    if headers:
+        s.headers.update(headers)
+    adapter = HTTPAdapter(
+        pool_connections=8,
+        pool_maxsize=pool_maxsize,
+        max_retries=Retry(total=retries, backoff_factor=backoff_factor, status_forcelist=RETRY_STATUSES),
+    )
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    return s
+
+def log_rate_limit(headers: Mapping[str, str], label: str):
+    """Print X-RateLimit-* headers once per label, to help tune concurrency."""
+    if label in _rate_limit_logged:
+        return
+    limits = {k: v for k, v in headers.items() if k.lower().startswith("x-ratelimit")}
+    if limits:
+        _rate_limit_logged.add(label)
+        print(f"[INFO] {label} rate limit: {limits}")
@@ -0,0 +1,48 @@
+"""
+JSON output helpers shared by the ETL scripts.
+Uses orjson when installed (much faster, writes bytes directly); falls back to json.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Iterable, Mapping, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(obj: Any, indent: bool = False) -> bytes:
+    """Serialize to UTF-8 bytes (non-ASCII kept as-is)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None).encode("utf-8")
+
+def dump_json(path: Path, obj: Any, indent: bool = True):
+    Path(path).write_bytes(dumps(obj, indent=indent))
+
+def write_feature_collection(path: Path, features: Iterable[dict],
+                             members: Optional[Mapping[str, Any]] = None) -> int:
+    """
+    Stream features into a compact FeatureCollection without building the whole
+    document in memory. Writes to a temp file first, so `path` may also be the
+    file the features are being read from. Other top-level members (name, crs,
+    bbox, ...) can be passed in `members`. Returns the number of features.
+    """
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    head = {"type": "FeatureCollection"}
+    head.update((k, v) for k, v in (members or {}).items() if k not in ("type", "features"))
+    n = 0
+    with open(tmp, "wb", buffering=1 << 20) as fh:
+        fh.write(dumps(head)[:-1] + b',"features":[')
+        for feat in features:
+            if n:
+                fh.write(b",")
+            fh.write(dumps(feat))
+            n += 1
+        fh.write(b"]}")
+    os.replace(tmp, path)
+    return n
@@ -0,0 +1,73 @@
+"""
+Persistent key/value cache in SQLite (data/cache.sqlite), one table per cache.
+Values are stored as JSON. Each write is a single-row upsert, so the cache never
+has to be rewritten as a whole, and it can be shared across threads.
+"""
+
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any
+
+
+class KVCache:
+    """Dict-like cache: `key in c`, `c[key]`, `c.get(key)`, `c[key] = value`."""
+
+    def __init__(self, path: Path, table: str = "kv"):
+        self._table = table
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS {table}(k TEXT PRIMARY KEY, v BLOB)")
+            self._conn.commit()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            row = self._conn.execute(f"SELECT v FROM {self._table} WHERE k=?", (key,)).fetchone()
+        return default if row is None else json.loads(row[0])
+
+    def __getitem__(self, key: str) -> Any:
+        with self._lock:
+            row = self._conn.execute(f"SELECT v FROM {self._table} WHERE k=?", (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return json.loads(row[0])
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(f"SELECT 1 FROM {self._table} WHERE k=?", (key,)).fetchone()
+        return row is not None
+
+    def __setitem__(self, key: str, value: Any):
+        self.update({key: value})
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self._table}").fetchone()[0]
+
+    def update(self, items: dict):
+        # machine-read only: no indentation, no escaping of non-ASCII
+        rows = [(k, json.dumps(v, ensure_ascii=False, separators=(",", ":"))) for k, v in items.items()]
+        with self._lock:
+            self._conn.executemany(f"INSERT OR REPLACE INTO {self._table}(k, v) VALUES (?, ?)", rows)
+            self._conn.commit()
+
+    def migrate_json(self, json_path: Path):
+        """Import a legacy JSON-blob cache, once, while the table is still empty."""
+        if not json_path.exists() or len(self):
+            return
+        try:
+            old = json.loads(json_path.read_text(encoding="utf-8"))
+        except Exception as e:
+            print(f"[WARN] Could not migrate {json_path}: {e}")
+            return
+        if isinstance(old, dict) and old:
+            self.update(old)
+            print(f"[INFO] Migrated {len(old)} cache entries from {json_path.name}")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
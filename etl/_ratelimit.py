@@ -0,0 +1,60 @@
+"""
+Token-bucket rate limiting shared by the ETL scripts.
+Callers wait only for the deficit, so time already spent in flight counts
+toward the limit (unlike a fixed sleep after every request).
+"""
+
+import asyncio
+import threading
+import time
+from typing import Mapping
+
+
+class TokenBucket:
+    """
+    `rate` requests per second with up to `burst` banked.
+    Thread-safe; use `acquire()` from sync code and `await acquire_async()` from asyncio.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = float(rate)
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.ts = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take a token (possibly going into debt) and return how long to wait for it."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.ts) * self.rate)
+            self.ts = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def acquire(self):
+        delay = self._reserve()
+        if delay:
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        delay = self._reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+    def pause(self, seconds: float):
+        """Hold back every caller for `seconds` (e.g. after a 429 Retry-After)."""
+        with self.lock:
+            self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+
+
+# Nominatim usage policy: at most 1 request per second, no bursts.
+NOMINATIM = TokenBucket(1.0, 1)
+
+
+def retry_after(headers: Mapping[str, str], default: float = 1.0) -> float:
+    """Seconds from a Retry-After header (the HTTP-date form falls back to `default`)."""
+    try:
+        return max(0.0, float(headers.get("Retry-After", default)))
+    except (TypeError, ValueError):
+        return default
@@ -1,16 +1,24 @@
-import os, re, json, time
+import os, re, json, time, atexit
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 
 from geopy.geocoders import Nominatim
 from geopy.extra.rate_limiter import RateLimiter
 from dotenv import load_dotenv
 
+from _jsonio import dump_json
+from _kvcache import KVCache
+
 ROOT = Path(__file__).resolve().parents[1]
 DATA_DIR = ROOT / "data"
 IN_JSON = DATA_DIR / "mrt_announcements.json"
 OUT_GEOJSON = DATA_DIR / "traffic_incidents.geojson"
-CACHE_FILE = DATA_DIR / "locations_cache.json"
+CACHE_DB = DATA_DIR / "cache.sqlite"
+LEGACY_CACHE_FILE = DATA_DIR / "locations_cache.json"     # imported into CACHE_DB once
+
+GEOCODE_WORKERS = 4
 
 # Johor Bahru bias box (lon/lat) W, S, E, N
 JB_VIEWBOX = ((1.40, 103.60), (1.55, 103.90))
@@ -28,28 +36,30 @@ GAZETTEER = {
     "JALAN SALLEH, KIM TENG PARK, JOHOR BAHRU": [103.7625, 1.4679],
 }
 
+_DASHES = str.maketrans({"–": "-", "—": "-"})
+_RE_PAREN_BB = re.compile(r"\((?:BOTH BOUNDS|BOTH DIRECTIONS)\)", re.I)
+_RE_PAREN_NEAR = re.compile(r"\(NEAR [^)]+\)", re.I)
+_RE_WS = re.compile(r"\s+")
+
 def norm(s: str) -> str:
     if not s: return ""
-    return " ".join(s.replace("–","-").replace("—","-").upper().split())
+    return " ".join(s.translate(_DASHES).upper().split())
 
-def load_cache() -> dict:
-    if CACHE_FILE.exists():
-        try:
-            return json.loads(CACHE_FILE.read_text(encoding="utf-8"))
-        except Exception:
-            return {}
-    return {}
+# Gazetteer keys normalized once, so lookups compare like with like
+GAZETTEER_NORM = {norm(k): v for k, v in GAZETTEER.items()}
 
-def save_cache(cache: dict):
-    CACHE_FILE.write_text(json.dumps(cache, ensure_ascii=False, indent=2), encoding="utf-8")
+def load_cache() -> KVCache:
+    cache = KVCache(CACHE_DB, table="locations")
+    cache.migrate_json(LEGACY_CACHE_FILE)
+    return cache
 
 def clean_location_for_search(text: str) -> str:
     if not text: return ""
     t = text
     # remove parenthetical clutter
-    t = re.sub(r"\((?:BOTH BOUNDS|BOTH DIRECTIONS)\)", "", t, flags=re.I)
-    t = re.sub(r"\(NEAR [^)]+\)", "", t, flags=re.I)
-    t = re.sub(r"\s+", " ", t).strip()
+    t = _RE_PAREN_BB.sub("", t)
+    t = _RE_PAREN_NEAR.sub("", t)
+    t = _RE_WS.sub(" ", t).strip()
     # title-case but keep all-uppercase tokens
     return " ".join([w if w.isupper() else w.title() for w in t.split()])
 
@@ -57,40 +67,52 @@ def location_from_title(title: str) -> str:
     if not title: return ""
     return title.split(" AT ", 1)[1].strip() if " AT " in title else title.strip()
 
-def best_date_iso(*cands):
-    fmts = ("%d %b %Y", "%d %B %Y", "%d %b, %Y", "%d %B, %Y")
-    for s in cands:
-        if not s: continue
-        s = str(s).strip()
-        for fmt in fmts:
-            try:
-                return datetime.strptime(s, fmt).date().isoformat()
-            except Exception:
-                pass
-        # already ISO?
+_DATE_FMTS = ("%d %b %Y", "%d %B %Y")
+_DATE_FMTS_COMMA = ("%d %b, %Y", "%d %B, %Y")
+
+@lru_cache(maxsize=4096)
+def _date_iso(s: str):
+    # only try the formats that can match: a comma in the input picks the comma variants
+    for fmt in (_DATE_FMTS_COMMA if "," in s else _DATE_FMTS):
         try:
-            return datetime.fromisoformat(s).date().isoformat()
+            return datetime.strptime(s, fmt).date().isoformat()
         except Exception:
             pass
+    # already ISO?
+    try:
+        return datetime.fromisoformat(s).date().isoformat()
+    except Exception:
+        return None
+
+def best_date_iso(*cands):
+    for s in cands:
+        if not s: continue
+        iso = _date_iso(str(s).strip())
+        if iso:
+            return iso
     return None
 
-def geocode_one(raw_text: str, geocode, cache: dict):
-    """Gazetteer -> cache -> limited candidate queries. No loops/retries beyond this list."""
+def geocode_known(raw_text: str, cache: dict):
+    """Gazetteer -> cache. No network."""
     if not raw_text: return None
 
     key = norm(raw_text)
 
     # gazetteer
-    if key in GAZETTEER:
-        return GAZETTEER[key]
-    for k, v in GAZETTEER.items():
+    if key in GAZETTEER_NORM:
+        return GAZETTEER_NORM[key]
+    for k, v in GAZETTEER_NORM.items():
         if k in key:
             return v
 
     # cache
-    if key in cache:
-        return cache[key]
+    return cache.get(key)
 
+def geocode_one_miss(raw_text: str, geocode, cache: dict):
+    """Limited candidate queries for a cache miss. No loops/retries beyond this list."""
+    if not raw_text: return None
+
+    key = norm(raw_text)
     cleaned = clean_location_for_search(raw_text)
     candidates = [
         f"{cleaned}, Johor Bahru, Malaysia",
@@ -106,7 +128,6 @@ def geocode_one(raw_text: str, geocode, cache: dict):
             if loc:
                 coords = [float(loc.longitude), float(loc.latitude)]
                 cache[key] = coords
-                save_cache(cache)
                 return coords
         except Exception as e:
             # swallow and move on to next candidate
@@ -114,6 +135,10 @@ def geocode_one(raw_text: str, geocode, cache: dict):
             continue
     return None
 
+def geocode_one(raw_text: str, geocode, cache: dict):
+    """Gazetteer -> cache -> limited candidate queries."""
+    return geocode_known(raw_text, cache) or geocode_one_miss(raw_text, geocode, cache)
+
 def main():
     # env for proper UA (Nominatim policy requires contact)
     load_dotenv = load_dotenv = __import__("dotenv").load_dotenv
@@ -136,7 +161,22 @@ def main():
 
     geolocator = Nominatim(user_agent=ua, timeout=20)
     geocode = RateLimiter(geolocator.geocode, min_delay_seconds=1.1, max_retries=1, swallow_exceptions=True)
-    cache = load_cache()
+    cache = load_cache()        # every set is committed; just close on exit
+    atexit.register(cache.close)
+
+    # geocode each distinct location once, then broadcast to the items
+    unique_locs = list({location_from_title((it.get("title") or "").strip()): None for it in items})
+
+    # pass 1: resolve what we can without the network
+    coords_by_loc = {loc: geocode_known(loc, cache) for loc in unique_locs}
+    misses = [loc for loc, coords in coords_by_loc.items() if loc and not coords]
+
+    # pass 2: geocode misses; the RateLimiter keeps Nominatim at ~1 req/s across threads
+    if misses:
+        print(f"[INFO] geocoding {len(misses)} of {len(unique_locs)} unique location(s) via Nominatim")
+        with ThreadPoolExecutor(max_workers=GEOCODE_WORKERS) as ex:
+            found = ex.map(lambda t: geocode_one_miss(t, geocode, cache), misses)
+            coords_by_loc.update(zip(misses, found))
 
     features = []
     total = len(items)
@@ -152,20 +192,22 @@ def main():
         scraped_at = it.get("scraped_at")
 
         # pick timestamp in priority order
-        timestamp = best_date_iso(start_date, end_date, scraped_at) or datetime.utcnow().date().isoformat()
+        start_iso = best_date_iso(start_date)
+        end_iso = best_date_iso(end_date)
+        timestamp = start_iso or end_iso or best_date_iso(scraped_at) or datetime.utcnow().date().isoformat()
         ts_ms = int(datetime.fromisoformat(timestamp).timestamp() * 1000)
 
 
         loc_text = location_from_title(title)
-        coords = geocode_one(loc_text, geocode, cache)
+        coords = coords_by_loc.get(loc_text)
         if not coords:
             print(f"[SKIP] No coords for: {loc_text}")
             continue
 
         props = {
             "title": title,
-            "start_date": best_date_iso(start_date),
-            "end_date": best_date_iso(end_date),
+            "start_date": start_iso,
+            "end_date": end_iso,
             "activity_time": activity_time,
             "description": description,
             "activity": activity,
@@ -191,7 +233,7 @@ def main():
         return
 
     fc = {"type": "FeatureCollection", "features": features}
-    OUT_GEOJSON.write_text(json.dumps(fc, ensure_ascii=False, indent=2), encoding="utf-8")
+    dump_json(OUT_GEOJSON, fc)
     print(f"[OK] wrote {OUT_GEOJSON} with {len(features)} features")
 
 if __name__ == "__main__":
@@ -12,7 +12,12 @@ If all fail, the area is skipped (with a log).
 """
 
 from pathlib import Path
-import json, csv, re, difflib
+import json, re
+
+import pandas as pd
+from rapidfuzz import process, fuzz
+
+from _jsonio import dump_json
 
 ROOT = Path(__file__).resolve().parents[1]
 DATA_DIR = ROOT / "data"
@@ -47,28 +52,46 @@ STATE_CENTROIDS = {
     "wilayah persekutuan putrajaya": (101.676, 2.925),
 }
 
+_RE_NONWORD = re.compile(r"[\W_]+", re.UNICODE)
+_RE_WS = re.compile(r"\s+")
+_RE_SEP = re.compile(r"[;,/]+")
+
 def norm(s: str) -> str:
     s = (s or "").lower()
-    s = re.sub(r"[\W_]+", " ", s, flags=re.UNICODE)
-    s = re.sub(r"\s+", " ", s).strip()
+    s = _RE_NONWORD.sub(" ", s)
+    s = _RE_WS.sub(" ", s).strip()
     return s
 
 def load_locations():
-    by_norm = {}
-    names = []
-    if IN_LOC.exists():
-        with IN_LOC.open(encoding="utf-8") as f:
-            for r in csv.DictReader(f):
-                try:
-                    name = r.get("location_name") or r.get("name") or ""
-                    lat = float(r.get("lat") or r.get("latitude"))
-                    lon = float(r.get("lon") or r.get("longitude"))
-                except Exception:
-                    continue
-                key = norm(name)
-                by_norm[key] = (lon, lat, name)
-                names.append(name)
-    return by_norm, names
+    if not IN_LOC.exists():
+        return {}, []
+    try:
+        # read as text so names like "NA" survive; coordinates are converted below
+        df = pd.read_csv(IN_LOC, encoding="utf-8", dtype=str, keep_default_na=False)
+    except pd.errors.EmptyDataError:
+        return {}, []
+
+    # accept alternate column names
+    for col, alt in (("location_name", "name"), ("lat", "latitude"), ("lon", "longitude")):
+        if col not in df.columns and alt in df.columns:
+            df[col] = df[alt]
+    if "lat" not in df.columns or "lon" not in df.columns:
+        return {}, []
+    if "location_name" not in df.columns:
+        df["location_name"] = ""
+
+    # rows without usable coordinates are dropped
+    df["lat"] = pd.to_numeric(df["lat"], errors="coerce")
+    df["lon"] = pd.to_numeric(df["lon"], errors="coerce")
+    df = df.dropna(subset=["lat", "lon"])
+
+    names = df["location_name"].fillna("").astype(str).tolist()
+    norm_names = (pd.Series(names, dtype=str).str.lower()
+                  .str.replace(_RE_NONWORD, " ", regex=True)
+                  .str.replace(_RE_WS, " ", regex=True)
+                  .str.strip().tolist())
+    by_norm = dict(zip(norm_names, zip(df["lon"].tolist(), df["lat"].tolist(), names)))
+    return by_norm, norm_names
 
 def coalesce(d, *keys):
     for k in keys:
@@ -87,21 +110,21 @@ def split_areas(val):
     if isinstance(val, list):
         parts = []
         for p in val:
-            for sub in re.split(r"[;,/]+", str(p)):
+            for sub in _RE_SEP.split(str(p)):
                 sub = sub.strip()
                 if sub:
                     parts.append(sub)
         return parts
     # string
     parts = []
-    for p in re.split(r"[;,/]+", str(val)):
+    for p in _RE_SEP.split(str(val)):
         p = p.strip()
         if p:
             parts.append(p)
     return parts
 
 def place_area(area_raw, loc_index):
-    by_norm, all_names = loc_index
+    by_norm, norm_names = loc_index
     k = norm(area_raw)
 
     # 1) exact match to locations.csv
@@ -114,12 +137,10 @@ def place_area(area_raw, loc_index):
         return STATE_CENTROIDS[k]
 
     # 3) fuzzy match against locations.csv
-    best = difflib.get_close_matches(area_raw, all_names, n=1, cutoff=0.78)
-    if best:
-        bk = norm(best[0])
-        if bk in by_norm:
-            lon, lat, _ = by_norm[bk]
-            return lon, lat
+    hit = process.extractOne(k, norm_names, scorer=fuzz.ratio, score_cutoff=78, processor=None)
+    if hit:
+        lon, lat, _ = by_norm[hit[0]]
+        return lon, lat
 
     return None
 
@@ -203,7 +224,7 @@ def main():
     log = []
     feats, stats = to_features(raw, loc_index, log)
     fc = {"type":"FeatureCollection","features":feats}
-    OUT_GEO.write_text(json.dumps(fc, ensure_ascii=False, indent=2), encoding="utf-8")
+    dump_json(OUT_GEO, fc)
 
     print(f"[OK] Wrote {OUT_GEO} with {len(feats)} features")
     print(f"[INFO] Stats: items={stats['total_items']} areas={stats['total_areas']} placed={stats['placed']} skipped={stats['skipped']}")
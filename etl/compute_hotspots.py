@@ -5,9 +5,10 @@ import math
 from pathlib import Path
 
 import geopandas as gpd
-from shapely.geometry import Polygon, Point
-from shapely.ops import transform
+import numpy as np
+from shapely.geometry import Polygon
 import pandas as pd
+import pyogrio
 import pyproj
 import argparse
 
@@ -20,48 +21,57 @@ DEFAULT_IN_FILES = [
 ]
 OUT = DATA_DIR / "hotspots_hex.geojson"
 
-def make_hex_grid(bounds_wgs84, hex_radius_m):
+SQRT3 = math.sqrt(3)
+
+def points_to_axial(x, y, hex_radius_m):
+    """
+    Axial (q, r) index of the pointy-top hex containing each EPSG:3857 point.
+    Closed form with cube rounding, so no spatial join is needed.
+    """
+    R = hex_radius_m
+    qf = (SQRT3 / 3 * x - y / 3) / R
+    rf = (2 / 3 * y) / R
+    sf = -qf - rf
+
+    q, r, s = np.rint(qf), np.rint(rf), np.rint(sf)
+    dq, dr, ds = np.abs(q - qf), np.abs(r - rf), np.abs(s - sf)
+    fix_q = (dq > dr) & (dq > ds)
+    fix_r = ~fix_q & (dr > ds)
+    q = np.where(fix_q, -r - s, q)
+    r = np.where(fix_r, -q - s, r)
+    return q.astype(np.int64), r.astype(np.int64)
+
+def axial_grid(bounds_m, hex_radius_m):
+    """Axial (q, r) of every hex covering an EPSG:3857 bbox (one cell of margin)."""
+    minx, miny, maxx, maxy = bounds_m
+    dx = hex_radius_m * SQRT3      # horizontal spacing between centers
+    dy = hex_radius_m * 1.5        # vertical spacing between centers
+
+    rows = np.arange(math.floor(miny / dy) - 1, math.ceil(maxy / dy) + 2)
+    cols = np.arange(math.floor(minx / dx) - 1, math.ceil(maxx / dx) + 2)
+    c, r = np.meshgrid(cols, rows)
+    # offset ("odd-r") -> axial
+    q = c - (r - (r & 1)) // 2
+    return q.ravel(), r.ravel()
+
+def hex_polygons(q, r, hex_radius_m):
     """
-    Create a hex grid (pointy-top) covering bounds in WGS84.
+    WGS84 polygons for pointy-top hexes given by axial (q, r) in EPSG:3857.
     hex_radius_m is the distance from center to any vertex (meters).
     """
-    minx, miny, maxx, maxy = bounds_wgs84
-
-    crs_wgs84 = pyproj.CRS("EPSG:4326")
-    crs_merc  = pyproj.CRS("EPSG:3857")
-    to_merc   = pyproj.Transformer.from_crs(crs_wgs84, crs_merc, always_xy=True).transform
-    to_wgs    = pyproj.Transformer.from_crs(crs_merc,  crs_wgs84, always_xy=True).transform
+    R = hex_radius_m
+    to_wgs = pyproj.Transformer.from_crs("EPSG:3857", "EPSG:4326", always_xy=True)
 
-    # Project bbox to meters 
-    (minx_m, miny_m) = transform(to_merc, Point(minx, miny)).coords[0]
-    (maxx_m, maxy_m) = transform(to_merc, Point(maxx, maxy)).coords[0]
-    pad = hex_radius_m * 2
-    minx_m -= pad; miny_m -= pad; maxx_m += pad; maxy_m += pad
+    cx = R * SQRT3 * (q + r / 2)
+    cy = R * 1.5 * r
 
-    # Pointy-top hex geometry constants
-    R = hex_radius_m
-    dx = R * math.sqrt(3)          # horizontal spacing between centers
-    dy = R * 1.5                   # vertical spacing between centers
-
-    cols = int(math.ceil((maxx_m - minx_m) / dx)) + 1
-    rows = int(math.ceil((maxy_m - miny_m) / dy)) + 1
-
-    # Prebuild local transformer to avoid recreating in loop
-    polys = []
-    for r in range(rows):
-        for c in range(cols):
-            cx = minx_m + c * dx + (dx / 2 if r % 2 else 0)  # offset every other row
-            cy = miny_m + r * dy
-            # 6 vertices (pointy-top)
-            verts = []
-            for i in range(6):
-                ang = math.pi / 3 * i
-                px = cx + R * math.cos(ang)
-                py = cy + R * math.sin(ang)
-                vx, vy = transform(to_wgs, Point(px, py)).coords[0]
-                verts.append((vx, vy))
-            polys.append(Polygon(verts))
-    return polys
+    # 6 vertices per cell, reprojected in a single PROJ call
+    angles = np.radians(np.arange(6) * 60 - 30)
+    px = (cx[:, None] + R * np.cos(angles)).ravel()
+    py = (cy[:, None] + R * np.sin(angles)).ravel()
+    vx, vy = to_wgs.transform(px, py)
+    verts = np.column_stack([vx, vy]).reshape(-1, 6, 2)
+    return [Polygon(v) for v in verts]
 
 def load_points(in_files):
     frames = []
@@ -70,7 +80,8 @@ def load_points(in_files):
         if not f.exists():
             continue
         try:
-            g = gpd.read_file(f)
+            # GDAL (C) reader with Arrow transfer; much faster than the Fiona path
+            g = pyogrio.read_dataframe(f, use_arrow=True)
             if g.empty:
                 continue
             # drop non-point geometries safely
@@ -94,8 +105,9 @@ def main():
     parser = argparse.ArgumentParser(description="Compute hexagon hotspots from point data.")
     parser.add_argument("--hex_m", type=int, default=2000, help="Hex radius in meters (center to vertex). Default 2000.")
     parser.add_argument("--inputs", nargs="*", default=[str(p) for p in DEFAULT_IN_FILES], help="Input point files (GeoJSON).")
-    parser.add_argument("--out", default=str(OUT), help="Output GeoJSON path.")
+    parser.add_argument("--out", default=str(OUT), help="Output path (GeoJSON; use a .fgb suffix for FlatGeobuf).")
     parser.add_argument("--weight_field", default=None, help="Optional numeric field to use as weight per point.")
+    parser.add_argument("--keep_empty", action="store_true", help="Also write hexes that contain no points.")
     args = parser.parse_args()
 
     pts = load_points(args.inputs)
@@ -103,37 +115,45 @@ def main():
         print("[ERROR] No point data found. Checked:", args.inputs)
         return
 
-    minx, miny, maxx, maxy = pts.total_bounds
-    hexes = make_hex_grid((minx, miny, maxx, maxy), args.hex_m)
-    hex_gdf = gpd.GeoDataFrame(geometry=hexes, crs="EPSG:4326")
-
-    # Spatial join: assign points to hexagon index
-    hex_gdf = hex_gdf.reset_index(names="hex_id")
-    joined = gpd.sjoin(pts, hex_gdf[["hex_id", "geometry"]], how="inner", predicate="within")
+    # Assign points to hexes analytically in projected meters
+    merc = pts.to_crs(epsg=3857)
+    q, r = points_to_axial(merc.geometry.x.to_numpy(), merc.geometry.y.to_numpy(), args.hex_m)
+    cells = pd.DataFrame({"q": q, "r": r})
 
     # Count (or weighted sum)
-    if args.weight_field and args.weight_field in joined.columns:
-        agg = joined.groupby("hex_id")[args.weight_field].sum().reset_index(name="value")
+    if args.weight_field and args.weight_field in pts.columns:
+        cells["w"] = pts[args.weight_field].to_numpy()
+        agg = cells.groupby(["q", "r"])["w"].sum().reset_index(name="value")
     else:
-        agg = joined.groupby("hex_id").size().reset_index(name="value")
+        agg = cells.value_counts(["q", "r"]).reset_index(name="value")
 
-    # Merge back
-    hex_gdf = hex_gdf.merge(agg, on="hex_id", how="left").fillna({"value": 0})
-    hex_gdf["value"] = hex_gdf["value"].astype(float)
+    if args.keep_empty:
+        gq, gr = axial_grid(merc.total_bounds, args.hex_m)
+        grid = pd.DataFrame({"q": gq, "r": gr})
+        agg = grid.merge(agg, on=["q", "r"], how="left").fillna({"value": 0})
+    else:
+        agg = agg[agg["value"] > 0]
+    agg["value"] = agg["value"].astype(float)
+
+    # Only occupied cells (or the full grid with --keep_empty) get geometry
+    agg = agg.sort_values(["r", "q"]).reset_index(drop=True)
+    hexes = hex_polygons(agg["q"].to_numpy(), agg["r"].to_numpy(), args.hex_m)
+    hex_gdf = gpd.GeoDataFrame(agg[["value"]], geometry=hexes, crs="EPSG:4326")
+    hex_gdf = hex_gdf.reset_index(names="hex_id")
 
-    # Compute hex area in km2 and density
-    merc = hex_gdf.to_crs(epsg=3857)
-    hex_gdf["area_km2"] = merc.geometry.area / 1_000_000.0
+    # Compute hex area in km2 and density; every cell is a regular hex of radius R in EPSG:3857
+    hex_gdf["area_km2"] = (3.0 * SQRT3 / 2.0) * (args.hex_m ** 2) / 1_000_000.0
     # Avoid division by zero
-    hex_gdf["density_per_km2"] = hex_gdf.apply(
-        lambda r: (r["value"] / r["area_km2"]) if r["area_km2"] > 0 else 0.0, axis=1
-    )
+    area = hex_gdf["area_km2"].to_numpy()
+    val = hex_gdf["value"].to_numpy()
+    hex_gdf["density_per_km2"] = np.where(area > 0, val / np.maximum(area, 1e-12), 0.0)
 
     out_path = Path(args.out)
     out_path.parent.mkdir(parents=True, exist_ok=True)
   
     export = hex_gdf[["hex_id", "value", "area_km2", "density_per_km2", "geometry"]]
-    export.to_file(out_path, driver="GeoJSON")
+    driver = "FlatGeobuf" if out_path.suffix.lower() == ".fgb" else "GeoJSON"
+    export.to_file(out_path, driver=driver, engine="pyogrio")
     print(f"[OK] Wrote hotspots -> {out_path}  (hex_m={args.hex_m}, features={len(export)})")
 
 if __name__ == "__main__":
@@ -6,29 +6,63 @@ Adds/overwrites: temp_min, temp_max, rain_chance, wind_speed, wind_dir, humidity
 
 """
 
-import json
+import asyncio
 import math
-import time
 from datetime import datetime, date
 from pathlib import Path
 from typing import Dict, Any, Optional
 
-import requests
+import aiohttp
+import ijson
+
+from _http import log_rate_limit
+from _jsonio import write_feature_collection
+from _kvcache import KVCache
+from _ratelimit import TokenBucket, retry_after
 
 ROOT = Path(__file__).resolve().parents[1]
 DATA_DIR = ROOT / "data"
 IN_GEOJSON = DATA_DIR / "weather_forecast.geojson"
 OUT_GEOJSON = DATA_DIR / "weather_forecast.geojson"      
-CACHE_FILE = DATA_DIR / "openmeteo_cache.json"
+CACHE_DB = DATA_DIR / "cache.sqlite"
+LEGACY_CACHE_FILE = DATA_DIR / "openmeteo_cache.json"     # imported into CACHE_DB once
 
 OPEN_METEO_URL = "https://api.open-meteo.com/v1/forecast"
+CONCURRENCY = 8     # Open-Meteo needs no key and tolerates a few parallel requests
+MAX_429_RETRIES = 3
+
+# Open-Meteo's free tier allows ~10 req/s with a small burst
+OPEN_METEO_LIMIT = TokenBucket(rate=10, burst=10)
+
+
+FIELDS = ("temp_min", "temp_max", "rain_chance", "wind_speed", "wind_dir", "humidity")
 
 
-def load_json(path: Path) -> Any:
-    return json.loads(path.read_text(encoding="utf-8"))
+def iter_features(path: Path):
+    """Stream features out of a FeatureCollection file (constant memory)."""
+    with open(path, "rb") as fh:
+        yield from ijson.items(fh, "features.item", use_float=True)
 
-def dump_json(path: Path, obj: Any):
-    path.write_text(json.dumps(obj, ensure_ascii=False, indent=2), encoding="utf-8")
+def collection_members(path: Path) -> Optional[Dict[str, Any]]:
+    """Top-level members except "features" (type, name, crs, ...), read without loading the features."""
+    members: Dict[str, Any] = {}
+    key = builder = None
+    with open(path, "rb") as fh:
+        for prefix, event, value in ijson.parse(fh, use_float=True):
+            if prefix:
+                if builder is not None:
+                    builder.event(event, value)
+                continue
+            if event == "start_map":
+                continue
+            if builder is not None:
+                members[key] = builder.value
+            if event == "map_key":
+                key = value
+                builder = None if key == "features" else ijson.ObjectBuilder()
+            else:
+                break           # end of the top-level object, or not an object at all
+    return members or None
 
 def safe_date(s: str) -> Optional[date]:
     if not s:
@@ -65,7 +99,7 @@ def pct(val) -> Optional[float]:
     except Exception:
         return None
 
-def fetch_open_meteo(lat: float, lon: float, day: date) -> Optional[Dict[str, Any]]:
+async def fetch_open_meteo(session: aiohttp.ClientSession, lat: float, lon: float, day: date) -> Optional[Dict[str, Any]]:
     """
     Get daily min/max temp, precip prob max, windspeed max, wind direction dominant,
     and hourly humidity (we'll use 12:00 local as representative).
@@ -85,9 +119,30 @@ def fetch_open_meteo(lat: float, lon: float, day: date) -> Optional[Dict[str, An
         ]),
         "hourly": "relative_humidity_2m",
     }
-    r = requests.get(OPEN_METEO_URL, params=params, timeout=25)
-    r.raise_for_status()
-    return r.json()
+    for attempt in range(MAX_429_RETRIES + 1):
+        await OPEN_METEO_LIMIT.acquire_async()
+        async with session.get(OPEN_METEO_URL, params=params, timeout=aiohttp.ClientTimeout(total=25)) as r:
+            if r.status == 429 and attempt < MAX_429_RETRIES:
+                # back off everyone, then re-queue this request
+                wait = retry_after(r.headers)
+                print(f"[WARN] Open-Meteo rate limited; retrying in {wait:.0f}s")
+                OPEN_METEO_LIMIT.pause(wait)
+                continue
+            r.raise_for_status()
+            log_rate_limit(r.headers, "Open-Meteo")
+            return await r.json()
+
+async def fetch_all(jobs):
+    """Fetch (lat, lon, day) jobs concurrently; returns results/exceptions in job order."""
+    sem = asyncio.Semaphore(CONCURRENCY)
+    # one pooled connector for the whole run (aiohttp already negotiates gzip)
+    connector = aiohttp.TCPConnector(limit=CONCURRENCY, ttl_dns_cache=600)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        async def one(job):
+            lat, lon, d = job
+            async with sem:
+                return await fetch_open_meteo(session, lat, lon, d)
+        return await asyncio.gather(*(one(j) for j in jobs), return_exceptions=True)
 
 def summarize_open_meteo(j: Dict[str, Any]) -> Dict[str, Any]:
     out = {"temp_min": None, "temp_max": None, "rain_chance": None, "wind_speed": None, "wind_dir": None, "humidity": None}
@@ -123,76 +178,94 @@ def summarize_open_meteo(j: Dict[str, Any]) -> Dict[str, Any]:
     return out
 
 
+def feature_job(feat: Dict[str, Any]):
+    """(lat, lon, day, cache key) for a Point feature that still misses fields, else None."""
+    geom = feat.get("geometry") or {}
+    props = feat.get("properties") or {}
+    coords = geom.get("coordinates")
+    if not coords or geom.get("type") != "Point":
+        return None
+
+    lon, lat = float(coords[0]), float(coords[1])
+    
+    d = None
+    for key in ("date","datetime","timestamp"):
+        d = safe_date(props.get(key)) or d
+    if not d:
+        # cannot query time-based daily; skip
+        return None
+
+    # Only fill when missing
+    needs = any(props.get(k) in (None, "", "null") for k in FIELDS)
+    if not needs:
+        return None
+
+    return lat, lon, d, cache_key(lat, lon, d)
+
+
 def main():
     if not IN_GEOJSON.exists():
         print(f"[ERROR] Missing {IN_GEOJSON}")
         return
 
-    g = load_json(IN_GEOJSON)
-    if g.get("type") != "FeatureCollection":
+    members = collection_members(IN_GEOJSON) or {}
+    if members.get("type") != "FeatureCollection":
         print("[ERROR] weather_forecast.geojson is not a FeatureCollection")
         return
 
-    cache = {}
-    if CACHE_FILE.exists():
-        try:
-            cache = load_json(CACHE_FILE)
-        except Exception:
-            cache = {}
-
-    features = g.get("features", [])
-    if not features:
-        print("[WARN] No features in weather_forecast.geojson")
-        return
+    cache = KVCache(CACHE_DB, table="openmeteo")
+    cache.migrate_json(LEGACY_CACHE_FILE)
 
-    updated = 0
-    total = len(features)
-    for i, feat in enumerate(features, 1):
-        geom = feat.get("geometry") or {}
-        props = feat.setdefault("properties", {})
-        coords = geom.get("coordinates")
-        if not coords or geom.get("type") != "Point":
+    # pass 1 (streamed): collect the unique cache keys that still need fetching
+    total = 0
+    pending = 0
+    needed = {}
+    for feat in iter_features(IN_GEOJSON):
+        total += 1
+        job = feature_job(feat)
+        if not job:
             continue
+        pending += 1
+        lat, lon, d, key = job
+        if key not in needed and key not in cache:
+            needed[key] = (lat, lon, d)
 
-        lon, lat = float(coords[0]), float(coords[1])
-        
-        d = None
-        for key in ("date","datetime","timestamp"):
-            d = safe_date(props.get(key)) or d
-        if not d:
-            # cannot query time-based daily; skip
-            continue
-
-        # Only fill when missing
-        needs = any(props.get(k) in (None, "", "null") for k in ("temp_min","temp_max","rain_chance","wind_speed","wind_dir","humidity"))
-        if not needs:
-            continue
+    if not total:
+        print("[WARN] No features in weather_forecast.geojson")
+        cache.close()
+        return
 
-        key = cache_key(lat, lon, d)
-        data = cache.get(key)
-        if not data:
-            try:
-                j = fetch_open_meteo(lat, lon, d)
-                data = summarize_open_meteo(j)
-                cache[key] = data
-              
-                time.sleep(0.2)
-            except Exception as e:
-                print(f"[WARN] Open-Meteo fetch failed @ {lat},{lon} {d}: {e}")
+    # one request per unique (rounded lat, rounded lon, date) key, fanned out in pass 2
+    if needed:
+        print(f"[INFO] fetching {len(needed)} unique point(s) for {pending} feature(s) from Open-Meteo ({CONCURRENCY} concurrent)")
+        results = asyncio.run(fetch_all(list(needed.values())))
+        for (key, (lat, lon, d)), j in zip(needed.items(), results):
+            if isinstance(j, Exception):
+                print(f"[WARN] Open-Meteo fetch failed @ {lat},{lon} {d}: {j}")
                 continue
+            cache[key] = summarize_open_meteo(j)
 
-        for k, v in data.items():
-            if props.get(k) in (None, "", "null") and v is not None:
-                props[k] = v
-
-        updated += 1
-        if i % 50 == 0 or i == total:
-            print(f"[INFO] processed {i}/{total} (updated {updated})")
+    # pass 2 (streamed): copy cached values into properties and write out
+    updated = 0
+    def enriched():
+        nonlocal updated
+        for i, feat in enumerate(iter_features(IN_GEOJSON), 1):
+            job = feature_job(feat)
+            data = cache.get(job[3]) if job else None
+            if data:
+                props = feat.setdefault("properties", {})
+                for k, v in data.items():
+                    if props.get(k) in (None, "", "null") and v is not None:
+                        props[k] = v
+                updated += 1
+            if i % 50 == 0 or i == total:
+                print(f"[INFO] processed {i}/{total} (updated {updated})")
+            yield feat
 
-    dump_json(CACHE_FILE, cache)
-    dump_json(OUT_GEOJSON, g)
+    write_feature_collection(OUT_GEOJSON, enriched(), members)
+    cache.close()
     print(f"[OK] Enriched {updated} feature(s). Wrote {OUT_GEOJSON}")
-    print(f"[OK] Cache saved -> {CACHE_FILE}")
+    print(f"[OK] Cache saved -> {CACHE_DB}")
 
 if __name__ == "__main__":
     main()
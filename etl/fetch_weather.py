@@ -1,72 +1,82 @@
 
-import os, json
-import requests
-import csv
+import os
 from pathlib import Path
 
+import pandas as pd
+
+from _http import make_session, log_rate_limit
+from _jsonio import dump_json
+
 DATA_DIR = Path(__file__).resolve().parents[1] / "data"
 DATA_DIR.mkdir(exist_ok=True)
 
 FORECAST_URL = "https://api.data.gov.my/weather/forecast?limit=500"
 WARNINGS_URL = "https://api.data.gov.my/weather/warning?limit=200"
 
-def load_location_lookup(path):
+SESSION = make_session()
+
+PROP_FIELDS = ["location_id", "location_name", "date", "summary_forecast", "morning_forecast",
+               "afternoon_forecast", "night_forecast", "min_temp", "max_temp"]
+
+def load_locations(path):
     # expects CSV: location_id,location_name,lat,lon
-    d = {}
+    empty = pd.DataFrame(columns=["location_id", "lat", "lon"])
     if not os.path.exists(path):
-        return d
-    with open(path, newline='', encoding='utf-8') as fh:
-        reader = csv.DictReader(fh)
-        for r in reader:
-            d[r['location_id']] = (float(r['lon']), float(r['lat']))
-    return d
+        return empty
+    try:
+        # ids read verbatim so "NA"/"null" survive; only blank coordinates count as missing
+        locs = pd.read_csv(path, usecols=["location_id", "lat", "lon"], dtype={"location_id": str},
+                           keep_default_na=False, na_values={"lat": [""], "lon": [""]},
+                           float_precision="round_trip")
+    except pd.errors.EmptyDataError:
+        return empty
+    locs = locs[locs["location_id"] != ""]
+    # last row wins for a repeated id, as with the previous dict lookup
+    return locs.dropna(subset=["lat", "lon"]).drop_duplicates("location_id", keep="last")
 
 def fetch_forecast():
-    r = requests.get(FORECAST_URL, timeout=20)
+    r = SESSION.get(FORECAST_URL, timeout=20)
     r.raise_for_status()
+    log_rate_limit(r.headers, "data.gov.my")
     payload = r.json()
     records = payload if isinstance(payload, list) else payload.get('data') or payload.get('result') or payload.get('records') or payload
 
-    locations = load_location_lookup(DATA_DIR / "locations.csv")
-    features = []
+    rows = []
     for rec in records:
         loc = rec.get('location', {})
-        loc_id = loc.get('location_id') or rec.get('location__location_id')
-        loc_name = loc.get('location_name') or rec.get('location__location_name')
-        coords = locations.get(loc_id)
-        if not coords:
-            continue
-        lon, lat = coords
-        props = {
-            'location_id': loc_id,
-            'location_name': loc_name,
-            'date': rec.get('date'),
-            'summary_forecast': rec.get('summary_forecast'),
-            'morning_forecast': rec.get('morning_forecast'),
-            'afternoon_forecast': rec.get('afternoon_forecast'),
-            'night_forecast': rec.get('night_forecast'),
-            'min_temp': rec.get('min_temp'),
-            'max_temp': rec.get('max_temp')
-        }
-        features.append({
+        rows.append({
+            'location_id': loc.get('location_id') or rec.get('location__location_id'),
+            'location_name': loc.get('location_name') or rec.get('location__location_name'),
+            **{k: rec.get(k) for k in PROP_FIELDS[2:]},
+        })
+    # object dtype keeps values exactly as the API returned them (None stays None)
+    df = pd.DataFrame(rows, columns=PROP_FIELDS, dtype=object)
+
+    # inner join drops records without a known location, keeping API order;
+    # pandas would match null ids to each other, so those never reach the join
+    df = df.dropna(subset=["location_id"])
+    merged = df.merge(load_locations(DATA_DIR / "locations.csv"), on="location_id", how="inner")
+    features = [
+        {
             "type": "Feature",
-            "geometry": {"type": "Point", "coordinates": [lon, lat]},
+            "geometry": {"type": "Point", "coordinates": [float(lon), float(lat)]},
             "properties": props
-        })
+        }
+        for props, lon, lat in zip(merged[PROP_FIELDS].to_dict(orient="records"), merged["lon"], merged["lat"])
+    ]
     out = {"type": "FeatureCollection", "features": features}
     outpath = DATA_DIR / "weather_forecast.geojson"
-    with open(outpath, "w", encoding="utf-8") as f:
-        json.dump(out, f, ensure_ascii=False)
+    dump_json(outpath, out, indent=False)
     print("Wrote", outpath)
 
 def fetch_warnings():
-    r = requests.get(WARNINGS_URL, timeout=20)
+    r = SESSION.get(WARNINGS_URL, timeout=20)
     r.raise_for_status()
+    log_rate_limit(r.headers, "data.gov.my")
     payload = r.json()
     recs = payload if isinstance(payload, list) else payload.get('data') or payload.get('result') or payload
     outpath = DATA_DIR / "weather_warnings.json"
-    with open(outpath, "w", encoding="utf-8") as f:
-        json.dump(recs, f, ensure_ascii=False)
+    dump_json(outpath, recs, indent=False)
     print("Wrote", outpath)
 
 if __name__ == '__main__':
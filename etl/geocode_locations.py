@@ -1,10 +1,15 @@
 import os
-import time
+import asyncio
 import csv
-import requests
 from pathlib import Path
+
+import aiohttp
+import pandas as pd
 from dotenv import load_dotenv
 
+import _geocode_cache
+from _ratelimit import NOMINATIM
+
 ROOT = Path(__file__).resolve().parents[1]
 DATA_DIR = ROOT / "data"
 DATA_DIR.mkdir(exist_ok=True)
@@ -15,12 +20,17 @@ load_dotenv(ROOT / ".env")
 GEOCODER_USER_AGENT = os.getenv("GEOCODER_USER_AGENT", "ackgis-weather-traffic/1.0 (contact@example.com)")
 FORECAST_LIST_URL = "https://api.data.gov.my/weather/forecast?limit=1000"
 
+NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
+# Requests in flight; the shared NOMINATIM bucket keeps starts >= 1s apart.
+NOMINATIM_CONCURRENCY = 1
+
 HEADERS = {"User-Agent": GEOCODER_USER_AGENT}
+TIMEOUT = aiohttp.ClientTimeout(total=20)
 
-def fetch_location_list_from_api():
-    r = requests.get(FORECAST_LIST_URL, timeout=20)
-    r.raise_for_status()
-    j = r.json()
+async def fetch_location_list_from_api(session):
+    async with session.get(FORECAST_LIST_URL, timeout=TIMEOUT) as r:
+        r.raise_for_status()
+        j = await r.json()
     records = j if isinstance(j, list) else j.get("data") or j.get("result") or j.get("records") or j.get("results") or j
     locs = {}
     for rec in records:
@@ -32,71 +42,77 @@ def fetch_location_list_from_api():
     return locs
 
 def load_existing_locations():
-    d = {}
     if not LOCATIONS_CSV.exists():
-        return d
-    with open(LOCATIONS_CSV, newline='', encoding='utf-8') as fh:
-        reader = csv.DictReader(fh)
-        for r in reader:
-            d[r['location_id']] = {
-                "location_name": r['location_name'],
-                "lat": float(r['lat']),
-                "lon": float(r['lon'])
-            }
-    return d
-
-def geocode_name(n):
+        return {}
+    try:
+        # coordinates parsed in one pass (round_trip keeps them exact, like float());
+        # names kept as text so "NA" survives
+        df = pd.read_csv(LOCATIONS_CSV, encoding="utf-8", keep_default_na=False, float_precision="round_trip",
+                         dtype={"location_id": str, "location_name": str, "lat": "float64", "lon": "float64"})
+    except pd.errors.EmptyDataError:
+        return {}
+    cols = df[["location_id", "location_name", "lat", "lon"]]
+    return {lid: (name, lat, lon) for lid, name, lat, lon in cols.itertuples(index=False, name=None)}
+
+async def geocode_name(session, sem, n):
+    cached = _geocode_cache.get(n)
+    if cached:
+        return cached
+
     # Nominatim Search API
-    url = "https://nominatim.openstreetmap.org/search"
     params = {"q": n + ", Malaysia", "format": "json", "limit": 1, "addressdetails": 0}
-    r = requests.get(url, params=params, headers=HEADERS, timeout=20)
-    r.raise_for_status()
-    arr = r.json()
+    async with sem:
+        # waits only for whatever is left of the 1s since the previous request started
+        await NOMINATIM.acquire_async()
+        async with session.get(NOMINATIM_URL, params=params, timeout=TIMEOUT) as r:
+            r.raise_for_status()
+            arr = await r.json()
     if not arr:
         return None
-    return float(arr[0]['lat']), float(arr[0]['lon'])
+    lat, lon = float(arr[0]['lat']), float(arr[0]['lon'])
+    _geocode_cache.put(n, lat, lon)
+    return lat, lon
 
 def save_locations(d):
-    # d: mapping location_id -> {location_name, lat, lon}
-    with open(LOCATIONS_CSV, "w", newline='', encoding='utf-8') as fh:
-        writer = csv.DictWriter(fh, fieldnames=["location_id","location_name","lat","lon"])
-        writer.writeheader()
-        for lid, info in sorted(d.items()):
-            writer.writerow({
-                "location_id": lid,
-                "location_name": info["location_name"],
-                "lat": info["lat"],
-                "lon": info["lon"]
-            })
-
-def main():
-    remote = fetch_location_list_from_api()
-    print("Found", len(remote), "unique location ids in MET forecast API.")
-    existing = load_existing_locations()
-
-    # Merge: prefer existing; geocode missing ones
-    merged = existing.copy()
-    to_geocode = []
-    for lid, lname in remote.items():
-        if lid not in merged:
-            to_geocode.append((lid, lname))
-
-    print("Need to geocode", len(to_geocode), "locations.")
-    for lid, lname in to_geocode:
+    # d: mapping location_id -> (location_name, lat, lon)
+    with open(LOCATIONS_CSV, "w", newline='', encoding='utf-8', buffering=1 << 20) as fh:
+        writer = csv.writer(fh)
+        writer.writerow(["location_id","location_name","lat","lon"])
+        writer.writerows((lid, name, lat, lon) for lid, (name, lat, lon) in sorted(d.items()))
+
+async def geocode_missing(session, to_geocode, merged):
+    sem = asyncio.Semaphore(NOMINATIM_CONCURRENCY)
+
+    async def one(lid, lname):
         try:
-            coords = geocode_name(lname)
+            coords = await geocode_name(session, sem, lname)
             if coords:
                 lat, lon = coords
-                merged[lid] = {"location_name": lname, "lat": lat, "lon": lon}
+                merged[lid] = (lname, lat, lon)
                 print("Geocoded", lname, "->", lat, lon)
             else:
                 print("No geocode result for", lname)
         except Exception as e:
             print("Error geocoding", lname, e)
-        # Nominatim policy: send 1 request per second max
-        time.sleep(1.1)
+
+    await asyncio.gather(*(one(lid, lname) for lid, lname in to_geocode))
+
+async def main():
+    connector = aiohttp.TCPConnector(limit=8, ttl_dns_cache=600)
+    async with aiohttp.ClientSession(headers=HEADERS, connector=connector) as session:
+        remote = await fetch_location_list_from_api(session)
+        print("Found", len(remote), "unique location ids in MET forecast API.")
+        existing = load_existing_locations()
+
+        # Merge: prefer existing; geocode missing ones
+        merged = existing.copy()
+        missing = remote.keys() - merged.keys()
+        to_geocode = [(lid, remote[lid]) for lid in sorted(missing)]
+
+        print("Need to geocode", len(to_geocode), "locations.")
+        await geocode_missing(session, to_geocode, merged)
     save_locations(merged)
     print("Saved", LOCATIONS_CSV)
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
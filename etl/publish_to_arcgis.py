@@ -1,4 +1,5 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import json
 import dotenv
@@ -14,18 +15,61 @@ ARCGIS_PASSWORD = os.getenv("ARCGIS_PASSWORD")
 # Optional: auto-share items publicly after create/publish (true/false)
 SHARE_PUBLIC = os.getenv("ARCGIS_SHARE_PUBLIC", "true").lower() in ("1","true","yes")
 
+def _batch_failures(result, items):
+    """Ids of `items` that delete_items did not report as deleted."""
+    if result is True:
+        return set()
+    if isinstance(result, dict):
+        result = result.get("results")
+    if isinstance(result, list):
+        return {r.get("itemId") for r in result if isinstance(r, dict) and not r.get("success")} & {it.id for it in items}
+    # False / None / unknown shape: assume nothing was deleted
+    return {it.id for it in items}
+
+def _delete_items(gis: GIS, items):
+    """Delete items in one batched call; per-item loop for failures or on older arcgis."""
+    if not items:
+        return
+    for it in items:
+        print(f"[INFO] Deleting existing {it.type}: {it.id} ({it.title})")
+    try:
+        failed = _batch_failures(gis.content.delete_items(items=items), items)
+        if not failed:
+            return
+        print(f"[WARN] Batch delete left {len(failed)} item(s), retrying one by one: {', '.join(sorted(failed))}")
+        items = [it for it in items if it.id in failed]
+    except AttributeError:
+        pass  # ContentManager.delete_items not available
+    except Exception as e:
+        print(f"[WARN] Batch delete failed, retrying one by one: {e}")
+    for it in items:
+        try:
+            if not it.delete():
+                print(f"[WARN] Failed to delete {it.id}: server refused (delete-protected or has dependents?)")
+        except Exception as e:
+            print(f"[WARN] Failed to delete {it.id}: {e}")
+
 def _delete_existing_by_title(gis: GIS, title: str, item_types):
     """Delete items owned by me with matching title and type in item_types."""
     me = gis.users.me
-    for itype in item_types:
-        hits = gis.content.search(query=f'title:"{title}" AND owner:{me.username}', item_type=itype, max_items=50)
-        for it in hits:
-            if it.title == title and it.owner == me.username:
-                print(f"[INFO] Deleting existing {itype}: {it.id} ({it.title})")
-                try:
-                    it.delete()
-                except Exception as e:
-                    print(f"[WARN] Failed to delete {it.id}: {e}")
+    query = f'title:"{title}" AND owner:{me.username}'
+    # one search per item type, issued concurrently
+    with ThreadPoolExecutor(max_workers=len(item_types)) as ex:
+        results = list(ex.map(lambda t: gis.content.search(query=query, item_type=t, max_items=50), item_types))
+    to_delete = {it.id: it for hits in results for it in hits if it.title == title and it.owner == me.username}
+    _delete_items(gis, list(to_delete.values()))
+
+def _prefetch_existing(gis: GIS, titles):
+    """One search for every item I own whose title is in `titles` (any type)."""
+    me = gis.users.me
+    title_q = " OR ".join(f'title:"{t}"' for t in titles)
+    hits = gis.content.search(query=f"({title_q}) AND owner:{me.username}", item_type=None, max_items=200)
+    return [it for it in hits if it.title in titles and it.owner == me.username]
+
+def _delete_from_prefetched(gis: GIS, hits, title: str, item_types):
+    """Delete prefetched items with matching title and type in item_types."""
+    wanted = {t.lower() for t in item_types}
+    _delete_items(gis, [it for it in hits if it.title == title and (it.type or "").lower() in wanted])
 
 def _share_if_requested(item):
     if not SHARE_PUBLIC:
@@ -47,15 +91,19 @@ def _upload_geojson_file_item(gis: GIS, geojson_path: Path, title: str, tags=Non
     print(f"[OK] Uploaded file item: {item.title}  id={item.id}  (no publishing privileges)")
     return item
 
-def _try_publish_feature_layer(gis: GIS, geojson_path: Path, title: str, tags=None, time_field=None):
+def _try_publish_feature_layer(gis: GIS, geojson_path: Path, title: str, tags=None, time_field=None, prefetched=None):
     """
     Try to publish a Hosted Feature Layer.
     On privilege error, fall back to uploading GeoJSON as a file item.
+    `prefetched` (from _prefetch_existing) avoids a fresh search for old items.
     """
     tags = tags or ["ackgis"]
 
     # Clean old items first
-    _delete_existing_by_title(gis, title, ["Feature Service", "GeoJSON"])
+    if prefetched is None:
+        _delete_existing_by_title(gis, title, ["Feature Service", "GeoJSON"])
+    else:
+        _delete_from_prefetched(gis, prefetched, title, ["Feature Service", "GeoJSON"])
 
     print(f"[INFO] Adding GeoJSON item: {title}")
     file_item = gis.content.add(item_properties={"title": title, "tags": ",".join(tags), "type": "GeoJson"},
@@ -97,11 +145,22 @@ def main():
         (data_dir / "weather_forecast.geojson",  "MET Forecasts",           ["ackgis","weather"], "date"),  # string date; you can add date_ms later if needed
     ]
 
-    for path, title, tags, time_field in targets:
-        if not path.exists():
-            print(f"[SKIP] Not found: {path}")
+    existing_targets = []
+    for target in targets:
+        if not target[0].exists():
+            print(f"[SKIP] Not found: {target[0]}")
             continue
-        _try_publish_feature_layer(gis, path, title, tags=tags, time_field=time_field)
+        existing_targets.append(target)
+    if not existing_targets:
+        return
+
+    # a single search finds every stale item for all targets
+    prefetched = _prefetch_existing(gis, [t[1] for t in existing_targets])
+
+    # each target is an independent chain of REST calls; run them side by side
+    with ThreadPoolExecutor(max_workers=len(existing_targets)) as ex:
+        list(ex.map(lambda t: _try_publish_feature_layer(gis, t[0], t[1], tags=t[2], time_field=t[3],
+                                                         prefetched=prefetched), existing_targets))
 
 if __name__ == "__main__":
     main()
@@ -1,42 +1,68 @@
-import json
-import time
+import asyncio
+import hashlib
+import sys
 from pathlib import Path
+import soupsieve as sv
 from bs4 import BeautifulSoup
-from playwright.sync_api import sync_playwright
+from playwright.async_api import async_playwright
+
+from _jsonio import dump_json
 
 ROOT = Path(__file__).resolve().parents[1]
 DATA_DIR = ROOT / "data"
 DATA_DIR.mkdir(exist_ok=True)
 OUT_FILE = DATA_DIR / "mrt_announcements.json"
 SNAP = DATA_DIR / "mrt_listing_snapshot.html"
+SNAP_SIG = SNAP.with_suffix(".sha")   # blake2b of the last snapshot written
 
 BASE = "https://www.mymrt.com.my/traffic-announcement/"
 PAGES = 5                            # you said total 5 pages
 PAGE_WAIT_MS = 400
-
-def fetch_html(url):
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        ctx = browser.new_context(user_agent=(
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0 Safari/537.36"
-        ))
-        page = ctx.new_page()
+UA = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0 Safari/537.36"
+)
+
+# CSS selectors used per item in parse_page, compiled once
+_SEL_UPPER = sv.compile("span[style*='text-transform:uppercase']")
+_SEL_YEAR = sv.compile("span[style*='font-weight:500']")
+_SEL_LEFT = sv.compile("span[style*='text-align:left']")
+_SEL_BOLD = sv.compile("span[style*='font-weight:700'], strong")
+_SEL_PDF = sv.compile("a.button[href$='.pdf'], a.button[href*='wp-content/uploads']")
+_SEL_ADDIV = sv.compile("div.addtoany_shortcode")
+
+# <p> labels whose following paragraph holds the value
+LABELS = (sys.intern("description"), sys.intern("activity"))
+_LABEL_LENS = frozenset(map(len, LABELS))
+
+async def fetch_one(ctx, url):
+    page = await ctx.new_page()
+    try:
         page.set_default_timeout(60000)
-        page.goto(url, wait_until="domcontentloaded")
+        await page.goto(url, wait_until="domcontentloaded")
         # gentle scroll to trigger lazy loads
         try:
-            page.evaluate("() => window.scrollTo(0, document.body.scrollHeight)")
-            page.wait_for_timeout(PAGE_WAIT_MS)
+            await page.evaluate("() => window.scrollTo(0, document.body.scrollHeight)")
+            await page.wait_for_timeout(PAGE_WAIT_MS)
         except Exception:
             pass
-        html = page.content()
-        ctx.close()
-        browser.close()
-        return html
+        return await page.content()
+    finally:
+        await page.close()
+
+async def fetch_all(urls):
+    """One Chromium/context for all pages; pages load concurrently. Returns HTML in url order."""
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        ctx = await browser.new_context(user_agent=UA)
+        try:
+            return await asyncio.gather(*(fetch_one(ctx, u) for u in urls))
+        finally:
+            await ctx.close()
+            await browser.close()
 
 def parse_page(html):
-    soup = BeautifulSoup(html, "html.parser")
+    soup = BeautifulSoup(html, "lxml")
     results = []
 
     for h5 in soup.find_all("h5"):
@@ -45,63 +71,67 @@ def parse_page(html):
             continue
 
         # Find a reasonable container around the h5 to search for spans/p tags
-        container = h5.find_parent(lambda tag: tag.name in ("div", "section", "article"))
+        container = h5.find_parent(["div", "section", "article"])
+        if container is None:
+            continue
 
         # Dates: find spans with 'text-transform:uppercase' (day/month) and the following year span
         start_date = None
         end_date = None
-        if container:
-            spans_upper = container.select("span[style*='text-transform:uppercase']")
-            spans_year = container.select("span[style*='font-weight:500']")
-            try:
-                if len(spans_upper) >= 1 and len(spans_year) >= 1:
-                    start_date = f"{spans_upper[0].get_text(strip=True)} {spans_year[0].get_text(strip=True)}"
-                if len(spans_upper) >= 2 and len(spans_year) >= 2:
-                    end_date = f"{spans_upper[1].get_text(strip=True)} {spans_year[1].get_text(strip=True)}"
-            except Exception:
-                pass
+        spans_upper = _SEL_UPPER.select(container)
+        spans_year = _SEL_YEAR.select(container)
+        try:
+            if len(spans_upper) >= 1 and len(spans_year) >= 1:
+                start_date = f"{spans_upper[0].get_text(strip=True)} {spans_year[0].get_text(strip=True)}"
+            if len(spans_upper) >= 2 and len(spans_year) >= 2:
+                end_date = f"{spans_upper[1].get_text(strip=True)} {spans_year[1].get_text(strip=True)}"
+        except Exception:
+            pass
 
         activity_time = None
-        if container:
-            at_span = container.select_one("span[style*='text-align:left']")
-            if at_span and "Activity Time" in at_span.get_text(" ", strip=True):
-                bold = at_span.select_one("span[style*='font-weight:700'], strong")
-                if bold:
-                    activity_time = bold.get_text(" ", strip=True)
-                else:
-                    # fallback: full block text
-                    activity_time = at_span.get_text(" ", strip=True)
-
-        def extract_after_label(container, label):
-            if not container:
-                return None
-            for p in container.find_all("p"):
-                if p.get_text(strip=True).lower() == label.lower():
-                    nxt = p.find_next_sibling()
-                    if nxt and nxt.name == "p":
-                        return nxt.get_text(" ", strip=True)
-                    # fallback: next text node
-                    nxt_text = p.find_next(string=True)
-                    if nxt_text and nxt_text.strip().lower() != label.lower():
-                        return nxt_text.strip()
-            return None
-
-        description = extract_after_label(container, "Description")
-        activity = extract_after_label(container, "Activity")
+        at_span = _SEL_LEFT.select_one(container)
+        if at_span and "Activity Time" in at_span.get_text(" ", strip=True):
+            bold = _SEL_BOLD.select_one(at_span)
+            if bold:
+                activity_time = bold.get_text(" ", strip=True)
+            else:
+                # fallback: full block text
+                activity_time = at_span.get_text(" ", strip=True)
+
+        # Description / Activity: a single walk over the <p> tags for all labels
+        found = {}
+        for p in container.find_all("p"):
+            text = p.get_text(strip=True)
+            if len(text) not in _LABEL_LENS:   # cheap reject before lower()
+                continue
+            label = sys.intern(text.lower())
+            if label not in LABELS or label in found:
+                continue
+            nxt = p.find_next_sibling()
+            if nxt and nxt.name == "p":
+                found[label] = nxt.get_text(" ", strip=True)
+            else:
+                # fallback: next text node
+                nxt_text = p.find_next(string=True)
+                if nxt_text and nxt_text.strip().lower() != label:
+                    found[label] = nxt_text.strip()
+            if len(found) == len(LABELS):
+                break
+
+        description = found.get("description")
+        activity = found.get("activity")
 
         # Media Release PDF link (button)
         media_link = None
-        if container:
-            a_btn = container.select_one("a.button[href$='.pdf'], a.button[href*='wp-content/uploads']")
-            if a_btn and a_btn.has_attr("href"):
-                media_link = a_btn["href"]
+        a_btn = _SEL_PDF.select_one(container)
+        if a_btn and a_btn.has_attr("href"):
+            media_link = a_btn["href"]
 
         # Post URL: look for addtoany shortcode data-a2a-url or canonical share link
         post_url = None
-        if container:
-            addiv = container.select_one("div.addtoany_shortcode")
-            if addiv and addiv.has_attr("data-a2a-url"):
-                post_url = addiv["data-a2a-url"]
+        addiv = _SEL_ADDIV.select_one(container)
+        if addiv and addiv.has_attr("data-a2a-url"):
+            post_url = addiv["data-a2a-url"]
         # fallback: find nearby anchor with the same title text
         if not post_url:
             possible = container.find_all("a", href=True)
@@ -121,31 +151,35 @@ def parse_page(html):
         })
     return results
 
-def main():
-    all_items = []
-    for p in range(1, PAGES + 1):
-        page_url = BASE if p == 1 else f"{BASE}?sf_paged={p}"
-        print(f"[INFO] fetching page {p} -> {page_url}")
-        html = fetch_html(page_url)
-        if p == 1:
-            Path(SNAP).write_text(html, encoding="utf-8")
-        items = parse_page(html)
-        print(f"[INFO] parsed {len(items)} items from page {p}")
-        all_items.extend(items)
-        time.sleep(0.5)
+def write_snapshot(html):
+    """Write the page-1 snapshot, skipping the write when the content is unchanged."""
+    h = hashlib.blake2b(html.encode("utf-8"), digest_size=16).digest()
+    if SNAP.exists() and SNAP_SIG.exists() and SNAP_SIG.read_bytes() == h:
+        return
+    SNAP.write_text(html, encoding="utf-8")
+    SNAP_SIG.write_bytes(h)
 
+def main():
+    urls = [BASE if p == 1 else f"{BASE}?sf_paged={p}" for p in range(1, PAGES + 1)]
+    print(f"[INFO] fetching {len(urls)} pages concurrently")
+    htmls = asyncio.run(fetch_all(urls))
 
-    # dedupe by title+post_url
+    # dedupe by title+post_url as pages are parsed
     seen = set()
     unique = []
-    for it in all_items:
-        sig = (it.get("title"), it.get("post_url"))
-        if sig in seen:
-            continue
-        seen.add(sig)
-        unique.append(it)
-
-    OUT_FILE.write_text(json.dumps(unique, ensure_ascii=False, indent=2), encoding="utf-8")
+    for p, html in enumerate(htmls, 1):
+        if p == 1:
+            write_snapshot(html)
+        items = parse_page(html)
+        print(f"[INFO] parsed {len(items)} items from page {p}")
+        for it in items:
+            sig = (it.get("title"), it.get("post_url"))
+            if sig in seen:
+                continue
+            seen.add(sig)
+            unique.append(it)
+
+    dump_json(OUT_FILE, unique)
     print(f"[DONE] wrote {len(unique)} announcements -> {OUT_FILE}")
 
 if __name__ == "__main__":
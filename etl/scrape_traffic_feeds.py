@@ -1,11 +1,18 @@
 import os
 import json
 import time
-import requests
+import asyncio
 from pathlib import Path
+
+import aiohttp
 from bs4 import BeautifulSoup
 from dotenv import load_dotenv
 
+import _geocode_cache
+from _http import RETRY_STATUSES, make_session
+from _jsonio import write_feature_collection
+from _ratelimit import NOMINATIM, retry_after
+
 ROOT = Path(__file__).resolve().parents[1]
 DATA_DIR = ROOT / "data"
 CONFIG = ROOT / "etl" / "traffic_feeds.json"
@@ -15,20 +22,55 @@ LOCATIONS_CSV = DATA_DIR / "locations.csv"
 load_dotenv(ROOT / ".env")
 HEADERS = {"User-Agent": os.getenv("GEOCODER_USER_AGENT", "ackgis-weather-traffic/1.0 (contact@example.com)")}
 
+# one pooled session for feed pages; retries absorb sporadic 429/5xx
+SESSION = make_session(headers=HEADERS, pool_maxsize=16, backoff_factor=0.5)
+
+NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
+# geocoding runs on aiohttp, so 429/5xx retries are done here (same budget as SESSION)
+NOMINATIM_RETRIES = 3
+NOMINATIM_BACKOFF = 0.5
+
 # --- simple geocode helper (uses Nominatim)
-def geocode_address(q):
-    url = "https://nominatim.openstreetmap.org/search"
+async def geocode_address(session, sem, q):
+    cached = _geocode_cache.get(q)
+    if cached:
+        return cached
     params = {"q": f"{q}, Malaysia", "format": "json", "limit": 1}
-    r = requests.get(url, params=params, headers=HEADERS, timeout=20)
-    r.raise_for_status()
-    arr = r.json()
+    async with sem:
+        for attempt in range(NOMINATIM_RETRIES + 1):
+            await NOMINATIM.acquire_async()
+            async with session.get(NOMINATIM_URL, params=params, timeout=aiohttp.ClientTimeout(total=20)) as r:
+                if r.status in RETRY_STATUSES and attempt < NOMINATIM_RETRIES:
+                    # honour Retry-After for every caller of the shared bucket, then retry
+                    wait = retry_after(r.headers, default=NOMINATIM_BACKOFF * 2 ** attempt)
+                    print(f"[WARN] Nominatim returned {r.status}; retrying in {wait:.1f}s")
+                    NOMINATIM.pause(wait)
+                    continue
+                r.raise_for_status()
+                arr = await r.json()
+            break
     if not arr: return None
-    return float(arr[0]['lat']), float(arr[0]['lon'])
+    lat, lon = float(arr[0]['lat']), float(arr[0]['lon'])
+    _geocode_cache.put(q, lat, lon)
+    return lat, lon
+
+async def geocode_texts(texts):
+    """Geocode distinct texts one at a time (1 req/s); returns {text: (lat, lon) | None}."""
+    sem = asyncio.Semaphore(1)
+    async with aiohttp.ClientSession(headers=HEADERS) as session:
+        async def one(q):
+            try:
+                return await geocode_address(session, sem, q)
+            except Exception as ge:
+                print("Geocode error:", ge)
+                return None
+        results = await asyncio.gather(*(one(q) for q in texts))
+    return dict(zip(texts, results))
 
 def parse_feed_entry(page_url, entry_selector, lat_selector=None, lon_selector=None, text_selector=None):
-    r = requests.get(page_url, headers=HEADERS, timeout=20)
+    r = SESSION.get(page_url, timeout=20)
     r.raise_for_status()
-    soup = BeautifulSoup(r.text, "html.parser")
+    soup = BeautifulSoup(r.text, "lxml")
     items = soup.select(entry_selector)
     out = []
     for el in items:
@@ -56,7 +98,10 @@ def run():
     with open(CONFIG, "r", encoding="utf-8") as fh:
         cfg = json.load(fh)
 
-    features = []
+    # pass 1: scrape every feed; entries without coordinates wait for geocoding,
+    # grouped by normalized text so each distinct location is looked up once
+    stubs = []
+    pending = {}
     for feed in cfg.get("feeds", []):
         url = feed["url"]
         print("Fetching feed", url)
@@ -71,31 +116,36 @@ def run():
             continue
 
         for e in entries:
-            lat = e.get("lat"); lon = e.get("lon"); txt = e.get("text")
-            if not lat or not lon:
-                if txt:
-                    try:
-                        coords = geocode_address(txt)
-                        if coords:
-                            lat, lon = coords
-                            time.sleep(1.1)  # nominatim rate limit
-                    except Exception as ge:
-                        print("Geocode error:", ge)
-            if not lat or not lon:
-                continue
-            feat = {
-                "type":"Feature",
-                "geometry":{"type":"Point","coordinates":[lon,lat]},
-                "properties":{"source":url,"text":txt}
-            }
-            features.append(feat)
+            stub = {"lat": e.get("lat"), "lon": e.get("lon"), "text": e.get("text"), "source": url}
+            if (not stub["lat"] or not stub["lon"]) and stub["text"]:
+                pending.setdefault(_geocode_cache.normalize(stub["text"]), []).append(stub)
+            stubs.append(stub)
         time.sleep(feed.get("delay", 1.0))
 
-    out = {"type":"FeatureCollection","features":features}
+    # pass 2: one Nominatim lookup per distinct text
+    if pending:
+        queries = {key: group[0]["text"] for key, group in pending.items()}
+        print("Geocoding", len(queries), "unique location text(s) for",
+              sum(len(g) for g in pending.values()), "entries")
+        found = asyncio.run(geocode_texts(list(queries.values())))
+        for key, group in pending.items():
+            coords = found.get(queries[key])
+            if coords:
+                for stub in group:
+                    stub["lat"], stub["lon"] = coords
+
+    # features are generated as they are written, never held as a list
+    features = (
+        {
+            "type":"Feature",
+            "geometry":{"type":"Point","coordinates":[stub["lon"],stub["lat"]]},
+            "properties":{"source":stub["source"],"text":stub["text"]}
+        }
+        for stub in stubs if stub["lat"] and stub["lon"]
+    )
     OUT.parent.mkdir(exist_ok=True)
-    with open(OUT, "w", encoding="utf-8") as fh:
-        json.dump(out, fh, ensure_ascii=False)
-    print("Wrote", OUT)
+    n = write_feature_collection(OUT, features)
+    print("Wrote", OUT, f"({n} features)")
 
 if __name__ == "__main__":
     run()